@@ -18,113 +18,607 @@ Environment variables (optional)
 """
 
 import argparse
+import asyncio
+import errno
+import functools
 import os
+import re
+import shlex
 import shutil
+import socket
+import struct
 import subprocess
 import sys
 import threading
 import time
-from http import server
+from collections import deque
+from http import HTTPStatus
 from pathlib import Path
-from typing import Optional, List
-import socketserver
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
 
 import cv2
+import numpy as np
 
+try:
+    import simplejpeg
+except ImportError:  # Optional: fall back to PyTurboJPEG / cv2.imencode
+    simplejpeg = None
+# encode_jpeg_yuv_planes arrived in simplejpeg 1.7, which needs Python 3.7+;
+# the Python 3.6 image gets 1.6.x without it
+_SIMPLEJPEG_YUV = hasattr(simplejpeg, "encode_jpeg_yuv_planes")
 
-def gstreamer_pipeline(width, height, fps, flip=0, sensor_id=0, sensor_mode=None):
+try:
+    from turbojpeg import (
+        TJFLAG_FASTDCT,
+        TJFLAG_PROGRESSIVE,
+        TJPF_BGR,
+        TJPF_BGRX,
+        TJSAMP_420,
+        TJSAMP_422,
+        TJSAMP_444,
+        TurboJPEG,
+    )
+
+    _TJ_SUBSAMPLING = {"444": TJSAMP_444, "422": TJSAMP_422, "420": TJSAMP_420}
+except ImportError:  # Optional: fall back to cv2.imencode when the wheel is missing
+    TurboJPEG = None
+
+try:
+    import gi
+
+    gi.require_version("Gst", "1.0")
+    from gi.repository import GLib, Gst
+except (ImportError, ValueError):  # Optional: open nvjpegenc pipelines through OpenCV
+    Gst = None
+
+# Published JPEGs are either bytes or a zero-copy view of an encoder buffer
+JpegData = Union[bytes, memoryview]
+
+_BOUNDARY = b"frame"
+_STREAM_CONTENT_TYPE = "multipart/x-mixed-replace; boundary=" + _BOUNDARY.decode()
+# bytes %-formatting runs in C and skips the str -> ASCII encode step
+_PART_HEADER = b"--" + _BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+# /snapshot.jpg is a one-off download: spend CPU on quality and Huffman
+# optimisation there, but never on the MJPEG stream path
+_SNAPSHOT_ENCODE_PARAM = [
+    int(cv2.IMWRITE_JPEG_QUALITY), 95,
+    int(cv2.IMWRITE_JPEG_OPTIMIZE), 1,
+]
+_INDEX_HTML = (
+    "<html><head><title>Camera Stream</title></head><body>"
+    "<h3>Live MJPEG Stream</h3>"
+    "<img src=\"/stream.mjpg\" style=\"max-width:100%;\"/>"
+    "<p><a href=\"/snapshot.jpg\">Snapshot</a></p>"
+    "</body></html>"
+).encode("utf-8")
+
+_WHICH_CACHE: Dict[str, Optional[str]] = {}
+
+
+def _env_truthy(name: str, default: str = "0") -> bool:
+    val = os.getenv(name, default)
+    return str(val).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _which(cmd: str) -> Optional[str]:
+    """shutil.which with the PATH scan cached per command."""
+    if cmd not in _WHICH_CACHE:
+        _WHICH_CACHE[cmd] = shutil.which(cmd)
+    return _WHICH_CACHE[cmd]
+
+
+def gstreamer_pipeline(
+    width,
+    height,
+    fps,
+    flip=0,
+    sensor_id=0,
+    sensor_mode=None,
+    jpeg_quality=None,
+    raw_format="BGRx",
+    out_size=None,
+):
     """Build a GStreamer pipeline for Jetson CSI camera.
 
     flip: 0 (none), 2 (flip horizontal), 4 (flip vertical), etc.
+    out_size: optional (width, height) that nvvidconv scales to on the VIC, so
+    the encoder only sees the smaller frame.
+    raw_format: BGRx (JPEG-encoded without a colour shuffle) or I420, which a
+    YUV-capable encoder consumes as-is, skipping the RGB->YCbCr front-end.
+    jpeg_quality: when set, encode on the NVJPG block with nvjpegenc so appsink
+    yields finished JPEG bytes and the frame never leaves NVMM as raw pixels.
     """
     mode = f" sensor-mode={sensor_mode}" if sensor_mode is not None else ""
-    return (
+    # The leaky queue drops the oldest buffer instead of stalling Argus when
+    # conversion/encode falls behind; appsink keeps only the newest frame
+    source = (
         f"nvarguscamerasrc sensor-id={sensor_id}{mode} ! "
-        f"video/x-raw(memory:NVMM), width={width}, height={height}, framerate={fps}/1 "
-        f"! nvvidconv flip-method={flip} ! video/x-raw, format=RGBA ! "
+        f"video/x-raw(memory:NVMM), width={width}, height={height}, framerate={fps}/1 ! "
+        "queue leaky=downstream max-size-buffers=2 max-size-bytes=0 max-size-time=0 "
+    )
+    scale = f", width={out_size[0]}, height={out_size[1]}" if out_size else ""
+    if jpeg_quality is not None:
+        return (
+            source
+            + f"! nvvidconv flip-method={flip} ! video/x-raw(memory:NVMM), format=I420{scale} ! "
+            f"nvjpegenc quality={jpeg_quality} ! "
+            "appsink name=sink drop=true max-buffers=1 sync=false"
+        )
+    return (
+        source
+        + f"! nvvidconv flip-method={flip} ! video/x-raw, format={raw_format}{scale} ! "
         "appsink drop=true max-buffers=1 sync=false"
     )
 
 
+@functools.lru_cache(maxsize=None)
+def _load_turbojpeg():
+    """Return a TurboJPEG handle, or None if PyTurboJPEG or libturbojpeg is missing."""
+    if TurboJPEG is None:
+        return None
+    try:
+        return TurboJPEG()
+    except (OSError, RuntimeError) as exc:
+        print(f"[camera-stream][warn] PyTurboJPEG unavailable ({exc}); using cv2.imencode")
+        return None
+
+
+def yuv_encoder_available(progressive: bool = False, width: int = 0) -> bool:
+    """Return True when a CPU encoder can take I420 planes without converting to BGR."""
+    if _SIMPLEJPEG_YUV and not progressive:
+        return True
+    # PyTurboJPEG's encode_from_yuv expects rows padded to 4 bytes; packed
+    # I420 only satisfies that when the chroma width (width / 2) does
+    return width % 8 == 0 and _load_turbojpeg() is not None
+
+
+def _i420_planes(frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split an OpenCV (H*3/2, W) I420 frame into Y, U, V plane views."""
+    height, width = frame.shape[0] * 2 // 3, frame.shape[1]
+    luma = height * width
+    flat = frame.reshape(-1)
+    y = flat[:luma].reshape(height, width)
+    u = flat[luma:luma + luma // 4].reshape(height // 2, width // 2)
+    v = flat[luma + luma // 4:luma + luma // 2].reshape(height // 2, width // 2)
+    return y, u, v
+
+
+def nvjpegenc_available() -> bool:
+    """Return True when the Jetson hardware JPEG encoder plugin is installed."""
+    if not _which("gst-inspect-1.0"):
+        return False
+    try:
+        proc = subprocess.run(
+            ["gst-inspect-1.0", "nvjpegenc"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=3,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return proc.returncode == 0
+
+
+class GstJpegCapture:
+    """nvjpegenc pipeline read straight from appsink with PyGObject.
+
+    Each JPEG comes back as one flat uint8 array, so OpenCV never wraps it in
+    a Mat. ERROR and EOS messages on the bus (sensor lost, Argus timeout) are
+    logged and turn into failed reads, as with cv2.VideoCapture.
+    Provides the parts of cv2.VideoCapture that build_capture and FrameGrabber use.
+    """
+
+    _CAP_FIELDS = {
+        cv2.CAP_PROP_FRAME_WIDTH: "width",
+        cv2.CAP_PROP_FRAME_HEIGHT: "height",
+    }
+
+    def __init__(self, pipeline: str, timeout: float = 5.0) -> None:
+        Gst.init(None)
+        self._opened = False
+        self._failed = False
+        self._timeout = timeout
+        try:
+            self._pipeline = Gst.parse_launch(pipeline)
+        except GLib.Error as exc:
+            print(f"[camera-stream][warn] Gst.parse_launch failed: {exc}")
+            self._pipeline = None
+            return
+        self._sink = self._pipeline.get_by_name("sink")
+        self._bus = self._pipeline.get_bus()
+        self._pipeline.set_state(Gst.State.PLAYING)
+        # Live sources report NO_PREROLL; FAILURE means Argus or nvjpegenc refused
+        ret, _state, _pending = self._pipeline.get_state(int(timeout * Gst.SECOND))
+        self._opened = ret != Gst.StateChangeReturn.FAILURE
+        if not self._opened:
+            self._pipeline.set_state(Gst.State.NULL)
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def read(self, image=None) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._opened or self._failed or self._check_bus():
+            return False, None
+        sample = self._sink.emit("try-pull-sample", int(self._timeout * Gst.SECOND))
+        # None on timeout or EOS; the next read finds the reason on the bus
+        if sample is None:
+            return False, None
+        buf = sample.get_buffer()
+        return True, np.frombuffer(buf.extract_dup(0, buf.get_size()), dtype=np.uint8)
+
+    def get(self, prop: int) -> float:
+        caps = self._sink.get_static_pad("sink").get_current_caps() if self._opened else None
+        if caps is None:
+            return 0.0
+        caps_struct = caps.get_structure(0)
+        if prop == cv2.CAP_PROP_FPS:
+            ok, num, den = caps_struct.get_fraction("framerate")
+            return num / den if ok and den else 0.0
+        ok, value = caps_struct.get_int(self._CAP_FIELDS.get(prop, ""))
+        return float(value) if ok else 0.0
+
+    def release(self) -> None:
+        if self._pipeline is not None:
+            self._pipeline.set_state(Gst.State.NULL)
+        self._opened = False
+
+    def _check_bus(self) -> bool:
+        """Log a pending ERROR or EOS; once seen, every later read() fails."""
+        msg = self._bus.pop_filtered(Gst.MessageType.ERROR | Gst.MessageType.EOS)
+        if msg is None:
+            return False
+        if msg.type == Gst.MessageType.ERROR:
+            err, debug = msg.parse_error()
+            print(f"[camera-stream][warn] GStreamer error from {msg.src.get_name()}: "
+                  f"{err.message} ({debug})")
+        else:
+            print("[camera-stream][warn] GStreamer pipeline reached end of stream")
+        self._failed = True
+        return True
+
+
 class FrameGrabber:
-    """Background thread that grabs frames and keeps the latest JPEG bytes."""
+    """Background threads that grab frames and keep the latest JPEG bytes.
+
+    Capture and JPEG encode run on separate threads so the two overlap on
+    different cores. Raw frames move between them through a triple buffer:
+    the capture thread fills ``back``, swaps it with ``ready`` and the encoder
+    swaps ``ready`` with ``front`` before encoding, so neither side ever
+    touches a buffer the other is using and no frame is copied.
+
+    A GstJpegCapture already yields finished JPEGs, so only capture runs.
+    """
+
+    # Recent frames kept for lookup by seq (/frame/<seq>.jpg)
+    history = 4
 
     def __init__(
         self,
         cap: cv2.VideoCapture,
         jpeg_quality: int = 80,
         target_fps: Optional[float] = None,
+        hw_encoded: bool = False,
+        subsampling: str = "420",
+        fastdct: bool = True,
+        yuv420: bool = False,
+        progressive: bool = False,
     ) -> None:
         self.cap = cap
         self.jpeg_quality = int(jpeg_quality)
+        # Chroma subsampling ("444", "422", "420") and libjpeg-turbo's fast DCT
+        self.subsampling = subsampling
+        self.fastdct = fastdct
+        # Progressive scans: smaller files for more encode CPU. simplejpeg
+        # cannot write them, so they need PyTurboJPEG or cv2.imencode
+        self.progressive = progressive
+        # True when the pipeline yields (H*3/2, W) I420 frames instead of BGRx;
+        # those are always encoded 4:2:0
+        self.yuv420 = yuv420
+        self._encode_param = self._cv2_encode_param()
+        # Reused BGR scratch frame for the cv2.imencode fallback
+        self._bgr_buf: Optional[np.ndarray] = None
+        # Pick the backend and bind its constant arguments once, so the
+        # per-frame encode is one call into C (which runs without the GIL)
+        # instead of a backend branch plus keyword building every frame.
+        # All but the cv2 fallback use libjpeg-turbo's NEON/SIMD encoder.
+        self._tj = None
+        if hw_encoded:
+            self.backend = "nvjpegenc"
+        elif _SIMPLEJPEG_YUV and yuv420 and not progressive:
+            self.backend = "simplejpeg (I420)"
+            self._simplejpeg_encode = functools.partial(
+                simplejpeg.encode_jpeg_yuv_planes,
+                quality=self.jpeg_quality,
+                fastdct=self.fastdct,
+            )
+            self._encode = self._encode_simplejpeg_yuv
+        elif simplejpeg is not None and not yuv420 and not progressive:
+            self.backend = "simplejpeg"
+            self._simplejpeg_encode = functools.partial(
+                simplejpeg.encode_jpeg,
+                quality=self.jpeg_quality,
+                colorsubsampling=self.subsampling,
+                fastdct=self.fastdct,
+            )
+            self._encode = self._encode_simplejpeg
+        else:
+            self._tj = _load_turbojpeg()
+            if self._tj is not None:
+                tj_flags = TJFLAG_FASTDCT if self.fastdct else 0
+                if progressive:
+                    tj_flags |= TJFLAG_PROGRESSIVE
+            if self._tj is not None and yuv420:
+                self.backend = "turbojpeg (I420)"
+                self._tj_encode = functools.partial(
+                    self._tj.encode_from_yuv,
+                    quality=self.jpeg_quality,
+                    jpeg_subsample=TJSAMP_420,
+                    flags=tj_flags,
+                )
+                self._encode = self._encode_turbojpeg_yuv
+            elif self._tj is not None:
+                self.backend = "turbojpeg"
+                self._tj_encode = functools.partial(
+                    self._tj.encode,
+                    quality=self.jpeg_quality,
+                    jpeg_subsample=_TJ_SUBSAMPLING[self.subsampling],
+                    flags=tj_flags,
+                )
+                self._encode = self._encode_turbojpeg
+            else:
+                self.backend = "opencv"
+                self._encode = self._encode_cv2
+        # True when the pipeline already yields JPEG bytes (nvjpegenc)
+        self.hw_encoded = hw_encoded
+        # Optional publish-rate cap. The source (nvarguscamerasrc framerate) paces
+        # capture and appsink drop=true max-buffers=1 absorbs any mismatch, so
+        # frames over the cap are skipped rather than slept on.
         self.target_interval = (1.0 / target_fps) if target_fps and target_fps > 0 else 0
+        self._next_publish = 0.0
         self._stop = threading.Event()
-        self._lock = threading.Lock()
-        self._latest_jpeg: Optional[bytes] = None
-        self._thread = threading.Thread(target=self._loop, name="FrameGrabber", daemon=True)
+        # Single-slot "latest value": list item assignment is atomic under the
+        # GIL, so the producer publishes (seq, jpeg) and consumers read it
+        # without a lock. Listeners are called after each publish to wake them.
+        self._seq = 0
+        self._latest_slot: List[Tuple[int, Optional[JpegData]]] = [(0, None)]
+        # Same trick for the history ring: one slot per seq % history
+        self._recent: List[Tuple[int, Optional[JpegData]]] = [(0, None)] * self.history
+        self._listeners: List[Callable[[], None]] = []
+        # Triple buffer of raw frames (indices into _raw_bufs)
+        self._raw_bufs: List[Optional[np.ndarray]] = [None, None, None]
+        self._back, self._ready, self._front = 0, 1, 2
+        self._raw_fresh = False
+        self._raw_cond = threading.Condition()
+        # Snapshot hand-off: the encoder copies its current raw frame for a
+        # waiting /snapshot.jpg request, which encodes it off the hot path
+        self._snap_cond = threading.Condition()
+        self._snap_wanted = False
+        self._snap_gen = 0
+        self._snap_frame: Optional[np.ndarray] = None
+        self._threads: List[threading.Thread] = []
+        self._threads.append(
+            threading.Thread(target=self._capture_loop, name="FrameGrabber-capture", daemon=True)
+        )
+        if not hw_encoded:
+            self._threads.append(
+                threading.Thread(target=self._encode_loop, name="FrameGrabber-encode", daemon=True)
+            )
 
     def start(self) -> None:
-        self._thread.start()
+        for thread in self._threads:
+            thread.start()
 
     def stop(self) -> None:
         self._stop.set()
-        self._thread.join(timeout=2.0)
+        with self._raw_cond:
+            self._raw_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
         try:
             self.cap.release()
         except Exception:
             pass
 
-    def latest_jpeg(self) -> Optional[bytes]:
-        with self._lock:
-            return self._latest_jpeg
+    def latest_jpeg(self) -> Optional[JpegData]:
+        return self._latest_slot[0][1]
+
+    def get(self, after_seq: int = 0) -> Optional[Tuple[int, JpegData]]:
+        """Return (seq, jpeg) if a frame newer than ``after_seq`` exists, else None."""
+        seq, jpeg = self._latest_slot[0]
+        if seq <= after_seq or jpeg is None:
+            return None
+        return seq, jpeg
+
+    def frame(self, seq: int) -> Optional[JpegData]:
+        """Return the JPEG published as ``seq`` if it is still in the history ring."""
+        ring_seq, jpeg = self._recent[seq % self.history]
+        return jpeg if ring_seq == seq else None
+
+    def snapshot_jpeg(self, timeout: float = 1.0) -> Optional[JpegData]:
+        """Re-encode the newest raw frame at high quality with optimized Huffman tables.
+
+        Falls back to the latest stream JPEG when frames arrive pre-encoded
+        (nvjpegenc) or the encoder does not hand over a frame in time.
+        """
+        if self.hw_encoded:
+            return self.latest_jpeg()
+        with self._snap_cond:
+            gen = self._snap_gen
+            self._snap_wanted = True
+            if not self._snap_cond.wait_for(lambda: self._snap_gen > gen, timeout):
+                return self.latest_jpeg()
+            frame = self._snap_frame
+        if self.yuv420:
+            frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+        ok, buf = cv2.imencode(".jpg", frame, _SNAPSHOT_ENCODE_PARAM)
+        if not ok:
+            return self.latest_jpeg()
+        return buf.reshape(-1).data
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Register a callback run on the grabber thread after each publish."""
+        self._listeners.append(callback)
 
-    def _loop(self) -> None:
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
+    def _cv2_encode_param(self) -> List[int]:
+        """imencode flags for the fallback path; newer flags only if cv2 has them."""
+        encode_param = [
+            int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality,
+            # Progressive output always carries optimized Huffman tables
+            int(cv2.IMWRITE_JPEG_OPTIMIZE), int(self.progressive),
+            int(cv2.IMWRITE_JPEG_PROGRESSIVE), int(self.progressive),
+        ]
+        sampling = getattr(cv2, f"IMWRITE_JPEG_SAMPLING_FACTOR_{self.subsampling}", None)
+        if sampling is not None:
+            encode_param += [int(cv2.IMWRITE_JPEG_SAMPLING_FACTOR), int(sampling)]
+        return encode_param
+
+    def _over_rate_cap(self) -> bool:
+        if self.target_interval <= 0:
+            return False
+        return time.monotonic() < self._next_publish
+
+    def _publish(self, jpeg_bytes: JpegData) -> None:
+        if self.target_interval > 0:
+            # Advance a fixed deadline rather than timing from the last publish,
+            # which would round every gap up to whole source frames (a 20 fps
+            # cap on a 30 fps camera gave 15 fps). After a stall (or on the first
+            # frame) restart the schedule one interval out so frames don't bunch up.
+            now = time.monotonic()
+            deadline = self._next_publish + self.target_interval
+            self._next_publish = deadline if deadline > now else now + self.target_interval
+        self._seq += 1
+        self._recent[self._seq % self.history] = (self._seq, jpeg_bytes)
+        self._latest_slot[0] = (self._seq, jpeg_bytes)
+        for callback in self._listeners:
+            callback()
+
+    def _on_jpeg(self, jpeg_bytes: JpegData) -> None:
+        if not self._over_rate_cap():
+            self._publish(jpeg_bytes)
+
+    def _capture_loop(self) -> None:
         while not self._stop.is_set():
-            ok, frame = self.cap.read()
+            buf = self._raw_bufs[self._back]
+            # Read straight into the back buffer; cv2 reallocates only if the
+            # frame size changes (or on the first frame)
+            ok, frame = self.cap.read(buf) if buf is not None else self.cap.read()
             if not ok or frame is None:
                 # Small backoff and try again
                 print("[camera-stream][debug] cap.read() failed or frame is None")
                 time.sleep(0.01)
                 continue
-            # Convert RGBA to BGR before JPEG encoding
-            if frame is not None and frame.ndim == 3 and frame.shape[2] == 4:
-                frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
-            else:
-                frame_bgr = frame
-            ok, buf = cv2.imencode(".jpg", frame_bgr, encode_param)
-            if not ok:
-                print("[camera-stream][debug] cv2.imencode failed")
-            if ok:
-                with self._lock:
-                    self._latest_jpeg = buf.tobytes()
-            if self.target_interval > 0:
-                # Throttle to target FPS
-                time.sleep(self.target_interval)
-
-
-def _describe_path(prefix: str, path: Path) -> None:
-    if path.exists():
-        try:
-            stat = path.stat()
-            print(
-                f"[camera-stream][debug] {prefix}: exists owner={stat.st_uid}:{stat.st_gid} "
-                f"mode={oct(stat.st_mode & 0o777)}"
-            )
-        except OSError as exc:
-            print(f"[camera-stream][debug] {prefix}: exists but stat failed ({exc})")
-    else:
-        print(f"[camera-stream][debug] {prefix}: MISSING")
+            if self.hw_encoded:
+                # appsink hands back a fresh (1, N) or (N,) uint8 buffer of JPEG bytes;
+                # publish a flat view of it rather than copying with tobytes()
+                self._on_jpeg(frame.reshape(-1).data)
+                continue
+            self._raw_bufs[self._back] = frame
+            with self._raw_cond:
+                self._back, self._ready = self._ready, self._back
+                self._raw_fresh = True
+                self._raw_cond.notify()
+
+    def _encode_loop(self) -> None:
+        while not self._stop.is_set():
+            with self._raw_cond:
+                if not self._raw_cond.wait_for(
+                    lambda: self._raw_fresh or self._stop.is_set(), timeout=0.5
+                ):
+                    continue
+                if self._stop.is_set():
+                    return
+                self._front, self._ready = self._ready, self._front
+                self._raw_fresh = False
+            frame = self._raw_bufs[self._front]
+            if self._snap_wanted:
+                with self._snap_cond:
+                    self._snap_frame = frame.copy()
+                    self._snap_wanted = False
+                    self._snap_gen += 1
+                    self._snap_cond.notify_all()
+            if self._over_rate_cap():
+                continue
+            try:
+                jpeg_bytes = self._encode(frame)
+            except Exception as exc:
+                # Keep the encoder thread alive; a dead one would freeze the stream
+                print(f"[camera-stream][warn] JPEG encode failed: {exc!r}")
+                continue
+            if jpeg_bytes is None:
+                continue
+            self._publish(jpeg_bytes)
+
+    def _encode_simplejpeg(self, frame) -> Optional[JpegData]:
+        # libjpeg-turbo reads BGRX directly; no cvtColor pass needed
+        colorspace = "BGRX" if frame.shape[-1] == 4 else "BGR"
+        return self._simplejpeg_encode(np.ascontiguousarray(frame), colorspace=colorspace)
+
+    def _encode_simplejpeg_yuv(self, frame) -> Optional[JpegData]:
+        return self._simplejpeg_encode(*_i420_planes(frame))
+
+    def _encode_turbojpeg(self, frame) -> Optional[JpegData]:
+        pixel_format = TJPF_BGRX if frame.shape[-1] == 4 else TJPF_BGR
+        return self._tj_encode(np.ascontiguousarray(frame), pixel_format=pixel_format)
+
+    def _encode_turbojpeg_yuv(self, frame) -> Optional[JpegData]:
+        if frame.shape[1] % 8:
+            # encode_from_yuv assumes 4-byte padded rows; packed chroma rows
+            # are only aligned when width / 2 is, so convert instead
+            return self._encode_cv2(frame)
+        # tjCompressFromYUV reads the packed Y/U/V planes straight from the frame
+        return self._tj_encode(frame, frame.shape[0] * 2 // 3, frame.shape[1])
+
+    def _encode_cv2(self, frame) -> Optional[JpegData]:
+        frame_bgr = frame
+        if self.yuv420:
+            size = (frame.shape[0] * 2 // 3, frame.shape[1], 3)
+            if self._bgr_buf is None or self._bgr_buf.shape != size:
+                self._bgr_buf = np.empty(size, np.uint8)
+            frame_bgr = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420, dst=self._bgr_buf)
+        elif frame.ndim == 3 and frame.shape[2] == 4:
+            # Drop the padding byte into a reused buffer instead of letting
+            # cv2 allocate a fresh HxWx3 array every frame
+            if self._bgr_buf is None or self._bgr_buf.shape[:2] != frame.shape[:2]:
+                self._bgr_buf = np.empty(frame.shape[:2] + (3,), np.uint8)
+            frame_bgr = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=self._bgr_buf)
+        ok, buf = cv2.imencode(".jpg", frame_bgr, self._encode_param)
+        if not ok:
+            print("[camera-stream][debug] cv2.imencode failed")
+            return None
+        # imencode allocates a new array per call, so a view is safe to publish
+        return buf.reshape(-1).data
+
+
+def _describe_path(prefix: str, path: Path) -> str:
+    # One stat() answers both "does it exist" and owner/mode
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return f"[camera-stream][debug] {prefix}: MISSING"
+    except OSError as exc:
+        return f"[camera-stream][debug] {prefix}: exists but stat failed ({exc})"
+    return (
+        f"[camera-stream][debug] {prefix}: exists owner={stat.st_uid}:{stat.st_gid} "
+        f"mode={oct(stat.st_mode & 0o777)}"
+    )
+
+
+def _video_nodes() -> List[str]:
+    try:
+        return sorted(entry.name for entry in os.scandir("/dev") if entry.name.startswith("video"))
+    except OSError:
+        return []
 
 
 def log_environment(args, pipeline: str) -> None:
     print(f"[camera-stream][debug] Attempting pipeline: {pipeline}")
-    _describe_path("Argus socket /tmp/argus_socket", Path("/tmp/argus_socket"))
-    _describe_path(f"CSI device /dev/video{args.sensor_id}", Path(f"/dev/video{args.sensor_id}"))
-    video_nodes = sorted(Path("/dev").glob("video*"))
+    print(_describe_path("Argus socket /tmp/argus_socket", Path("/tmp/argus_socket")))
+    device = f"/dev/video{args.sensor_id}"
+    print(_describe_path(f"CSI device {device}", Path(device)))
+    video_nodes = _video_nodes()
     print(
         "[camera-stream][debug] Video nodes visible: "
-        + (", ".join(node.name for node in video_nodes) if video_nodes else "<none>")
+        + (", ".join(video_nodes) if video_nodes else "<none>")
     )
     print(
         "[camera-stream][debug] Env CSI_WIDTH/HEIGHT/FPS/ID/MODE="
@@ -150,7 +644,7 @@ def log_environment(args, pipeline: str) -> None:
 def _log_gstreamer_probe():
     def _run(cmd: List[str]) -> None:
         print(f"[camera-stream][debug] $ {' '.join(cmd)}")
-        if not shutil.which(cmd[0]):
+        if not _which(cmd[0]):
             print(f"[camera-stream][warn] {cmd[0]} not found in PATH")
             return
         proc = subprocess.run(
@@ -173,7 +667,7 @@ def _log_gstreamer_probe():
 
 def _log_nvargus_daemon_status():
     # Note: In containers, systemctl is typically unavailable; skip gracefully.
-    if not shutil.which("systemctl"):
+    if not _which("systemctl"):
         print("[camera-stream][debug] systemctl not found; skipping nvargus-daemon status (expected in containers)")
         return
     cmd = ["systemctl", "status", "nvargus-daemon"]
@@ -195,19 +689,30 @@ def _log_nvargus_daemon_status():
 
 
 def test_pipeline(pipeline: str) -> None:
-    # Test the pipeline with gst-launch to get detailed errors
-    test_pipe = pipeline.replace("appsink drop=true max-buffers=1 sync=false", "fakesink num-buffers=1 sync=false")
-    cmd = ["gst-launch-1.0", "--gst-debug=3"] + test_pipe.split(" ! ")
+    # Test the pipeline with gst-launch to get detailed errors; swap the
+    # trailing appsink (whatever its properties) for a one-buffer fakesink
+    test_pipe = re.sub(r"appsink[^!]*$", "fakesink num-buffers=1 sync=false", pipeline)
+    # gst-launch escapes spaces inside each argument before joining them, so
+    # the description must arrive as one token per word, "!" links included
+    cmd = ["gst-launch-1.0", "--gst-debug=3", *shlex.split(test_pipe)]
     print(f"[camera-stream][debug] Testing pipeline with gst-launch: {' '.join(cmd)}")
     env = os.environ.copy()
     env["GST_DEBUG"] = "3"  # Increase debug level for this test
-    proc = subprocess.run(
-        cmd,
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True,
-    )
+    try:
+        proc = subprocess.run(
+            cmd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=15,
+        )
+    except subprocess.TimeoutExpired:
+        print("[camera-stream][warn] gst-launch test timed out after 15s")
+        return
+    except OSError as exc:
+        print(f"[camera-stream][warn] gst-launch test could not run ({exc})")
+        return
     print(f"[camera-stream][debug] exit={proc.returncode}")
     if proc.stdout:
         print(f"[camera-stream][debug] stdout:\n{proc.stdout}")
@@ -216,17 +721,64 @@ def test_pipeline(pipeline: str) -> None:
 
 
 def build_capture(args):
+    """Open the CSI capture; returns (cap, hw_encoded, yuv420)."""
+    hw_encoded = args.encoder == "nvjpeg" or (
+        args.encoder == "auto" and nvjpegenc_available()
+    )
+    # 4:2:0 output can be encoded from I420 planes directly, which saves the
+    # BGRx frame and the encoder's own colour conversion
+    out_width = args.stream_scale[0] if args.stream_scale else args.width
+    raw_format = (
+        "I420"
+        if args.subsampling == "420" and yuv_encoder_available(args.progressive, out_width)
+        else "BGRx"
+    )
     pipeline = gstreamer_pipeline(
-        args.width, args.height, args.fps, args.flip, args.sensor_id, args.sensor_mode
+        args.width,
+        args.height,
+        args.fps,
+        args.flip,
+        args.sensor_id,
+        args.sensor_mode,
+        jpeg_quality=args.quality if hw_encoded else None,
+        raw_format=raw_format,
+        out_size=args.stream_scale,
     )
-    log_environment(args, pipeline)
-    
-    # Set global GST_DEBUG for more output
-    os.environ["GST_DEBUG"] = "3"
-    
-    cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+    # Preflight probes fork gst-inspect and stat /dev; only pay for them when
+    # debugging. Failures still log them before running test_pipeline below.
+    debug = _env_truthy("CAMERA_DEBUG", "0")
+    if debug:
+        log_environment(args, pipeline)
+        # Set global GST_DEBUG for more output
+        os.environ["GST_DEBUG"] = "3"
+
+    cap = None
+    if hw_encoded and Gst is not None:
+        # Drive nvjpegenc through GStreamer directly; appsink JPEGs skip the Mat wrapper
+        cap = GstJpegCapture(pipeline)
+        if not cap.isOpened():
+            print("[camera-stream][warn] GStreamer appsink failed to open; retrying via OpenCV")
+            cap = None
+    if cap is None:
+        cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+    if not cap.isOpened() and hw_encoded and args.encoder == "auto":
+        print("[camera-stream][warn] nvjpegenc pipeline failed to open; falling back to CPU encode")
+        hw_encoded = False
+        pipeline = gstreamer_pipeline(
+            args.width,
+            args.height,
+            args.fps,
+            args.flip,
+            args.sensor_id,
+            args.sensor_mode,
+            raw_format=raw_format,
+            out_size=args.stream_scale,
+        )
+        cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
     if not cap.isOpened():
         print("[camera-stream][debug] cv2.VideoCapture failed to open. Running pipeline test...")
+        if not debug:
+            log_environment(args, pipeline)
         test_pipeline(pipeline)
         sys.exit(
             "[camera-stream] Unable to open CSI camera via nvarguscamerasrc. "
@@ -238,72 +790,400 @@ def build_capture(args):
         print(f"[camera-stream][debug] CAP_PROP_FRAME_WIDTH: {cap.get(cv2.CAP_PROP_FRAME_WIDTH)}")
         print(f"[camera-stream][debug] CAP_PROP_FRAME_HEIGHT: {cap.get(cv2.CAP_PROP_FRAME_HEIGHT)}")
         print(f"[camera-stream][debug] CAP_PROP_FPS: {cap.get(cv2.CAP_PROP_FPS)}")
-    return cap
-
-
-def make_http_handler(grabber: FrameGrabber):
-    boundary = b"frame"
-
-    class Handler(server.BaseHTTPRequestHandler):
-        def do_GET(self):  # noqa: N802 (http handler sig)
-            if self.path in ("/", "/index.html"):
-                self.send_response(200)
-                self.send_header("Content-Type", "text/html; charset=utf-8")
-                self.end_headers()
-                self.wfile.write(
-                    (
-                        "<html><head><title>Camera Stream</title></head><body>"
-                        "<h3>Live MJPEG Stream</h3>"
-                        "<img src=\"/stream.mjpg\" style=\"max-width:100%;\"/>"
-                        "<p><a href=\"/snapshot.jpg\">Snapshot</a></p>"
-                        "</body></html>"
-                    ).encode("utf-8")
+    return cap, hw_encoded, not hw_encoded and raw_format == "I420"
+
+
+# Linux MSG_ZEROCOPY (kernel >= 4.14); older Pythons lack the constants
+_SO_ZEROCOPY = getattr(socket, "SO_ZEROCOPY", 60)
+_MSG_ZEROCOPY = getattr(socket, "MSG_ZEROCOPY", 0x4000000)
+_MSG_ERRQUEUE = getattr(socket, "MSG_ERRQUEUE", 0x2000)
+_SO_EE_ORIGIN_ZEROCOPY = 5
+# struct sock_extended_err: errno, origin, type, code, pad, info, data
+_SOCK_EXTENDED_ERR = struct.Struct("=IBBBBII")
+
+
+class _ZeroCopyTracker:
+    """Keep MSG_ZEROCOPY payloads alive until the kernel reports it is done with them.
+
+    Every zerocopy sendmsg gets the next id; completions arrive on the socket
+    error queue as [lo, hi] id ranges and release the matching buffers.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self._next_id = 0
+        self._pending: Deque[Tuple[int, Tuple[memoryview, ...]]] = deque()
+
+    @classmethod
+    def enable(cls, sock: socket.socket) -> Optional["_ZeroCopyTracker"]:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, _SO_ZEROCOPY, 1)
+        except OSError:
+            # Kernel without SO_ZEROCOPY (e.g. L4T's 4.9); use regular sends
+            return None
+        return cls(sock)
+
+    def hold(self, views: Tuple[memoryview, ...]) -> None:
+        self._pending.append((self._next_id, views))
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+
+    def reap(self) -> None:
+        while self._pending:
+            try:
+                _data, ancdata, _flags, _addr = self.sock.recvmsg(
+                    0, 256, _MSG_ERRQUEUE | socket.MSG_DONTWAIT
                 )
+            except (BlockingIOError, InterruptedError):
                 return
+            for _level, _type, cdata in ancdata:
+                if len(cdata) < _SOCK_EXTENDED_ERR.size:
+                    continue
+                _err, origin, _t, _c, _p, _lo, hi = _SOCK_EXTENDED_ERR.unpack_from(cdata)
+                if origin != _SO_EE_ORIGIN_ZEROCOPY:
+                    continue
+                while self._pending and self._pending[0][0] <= hi:
+                    self._pending.popleft()
 
-            if self.path == "/snapshot.jpg":
-                frame = grabber.latest_jpeg()
-                if not frame:
-                    self.send_error(503, "No frame available yet")
-                    return
-                self.send_response(200)
-                self.send_header("Content-Type", "image/jpeg")
-                self.send_header("Content-Length", str(len(frame)))
-                self.end_headers()
-                self.wfile.write(frame)
-                return
 
-            if self.path == "/stream.mjpg":
-                self.send_response(200)
-                self.send_header(
-                    "Content-Type",
-                    f"multipart/x-mixed-replace; boundary={boundary.decode()}",
-                )
-                self.end_headers()
-                # Stream loop
-                try:
-                    while True:
-                        frame = grabber.latest_jpeg()
-                        if not frame:
-                            time.sleep(0.01)
-                            continue
-                        self.wfile.write(b"--" + boundary + b"\r\n")
-                        self.wfile.write(b"Content-Type: image/jpeg\r\n")
-                        self.wfile.write(f"Content-Length: {len(frame)}\r\n\r\n".encode("ascii"))
-                        self.wfile.write(frame)
-                        self.wfile.write(b"\r\n")
-                except (BrokenPipeError, ConnectionResetError):
-                    # Client disconnected
-                    return
+async def _wait_writable(loop: asyncio.AbstractEventLoop, sock: socket.socket) -> None:
+    fut = loop.create_future()
+    fd = sock.fileno()
+    loop.add_writer(fd, lambda: fut.done() or fut.set_result(None))
+    try:
+        await fut
+    finally:
+        loop.remove_writer(fd)
+
+
+async def _sock_send_buffers(
+    loop: asyncio.AbstractEventLoop,
+    sock: socket.socket,
+    buffers: Iterable[JpegData],
+    zerocopy: Optional[_ZeroCopyTracker] = None,
+) -> None:
+    """Write buffers with scatter/gather sendmsg so the JPEG is never concatenated.
+
+    With a zerocopy tracker the kernel reads the pages in place instead of
+    copying them into the socket buffer.
+    """
+    views = [memoryview(b) for b in buffers if len(b)]
+    flags = _MSG_ZEROCOPY if zerocopy is not None else 0
+    while views:
+        try:
+            sent = sock.sendmsg(views, (), flags)
+        except (BlockingIOError, InterruptedError):
+            if zerocopy is not None:
+                # Pending completions keep the fd flagged; clear them first
+                zerocopy.reap()
+            await _wait_writable(loop, sock)
+            continue
+        except OSError as exc:
+            if not flags or exc.errno != errno.ENOBUFS:
+                raise
+            # Out of optmem for pinned pages; copy the rest as usual
+            flags = 0
+            continue
+        if flags:
+            zerocopy.hold(tuple(views))
+        while sent:
+            if sent >= len(views[0]):
+                sent -= len(views.pop(0))
             else:
-                self.send_error(404, "Not Found")
+                views[0] = views[0][sent:]
+                sent = 0
+
+
+def _response_head(code: int, headers: Iterable[Tuple[str, str]] = ()) -> bytes:
+    lines = [f"HTTP/1.1 {code} {HTTPStatus(code).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+_INDEX_HEAD = _response_head(
+    200,
+    (("Content-Type", "text/html; charset=utf-8"), ("Content-Length", str(len(_INDEX_HTML)))),
+)
+# The multipart body has no length, so the connection ends with it
+_STREAM_HEAD = _response_head(
+    200,
+    (
+        ("Content-Type", _STREAM_CONTENT_TYPE),
+        ("Cache-Control", "no-store"),
+        ("Connection", "close"),
+    ),
+)
+# ASCII digits only: str.isdigit() also accepts e.g. superscripts that int() rejects
+_FRAME_PATH = re.compile(r"/frame/([0-9]{1,20})\.jpg")
+_EVENTS_HEAD = _response_head(
+    200,
+    (
+        ("Content-Type", "text/event-stream"),
+        ("Cache-Control", "no-store"),
+        ("Connection", "close"),
+    ),
+)
+
+
+class MJPEGServer:
+    """asyncio HTTP server that fans the latest JPEG out to every viewer.
+
+    One event-loop thread serves all connections on non-blocking sockets, so
+    viewers cost a coroutine each instead of an OS thread. The grabber threads
+    wake the loop through call_soon_threadsafe whenever a frame is published
+    and someone is streaming.
+    Routes: / (index), /snapshot.jpg, /stream.mjpg, /events (Server-Sent
+    Events carrying each new seq) and /frame/<seq>.jpg, so pull clients can
+    fetch frames at their own pace.
+    """
+
+    send_buffer_size = 1 << 20
+    max_request_bytes = 8192
+    # Pinning pages only beats copying for writes of roughly 10 KB and up
+    zerocopy_min_bytes = 10 * 1024
+
+    def __init__(
+        self, grabber: FrameGrabber, max_stream_clients: int = 8, zerocopy: bool = False
+    ) -> None:
+        self.grabber = grabber
+        self.max_stream_clients = max_stream_clients
+        self.zerocopy = zerocopy
+        # Route table: each handler returns True if the connection may be reused
+        self._routes: Dict[str, Callable[[socket.socket], Awaitable[bool]]] = {
+            "/": self._index,
+            "/index.html": self._index,
+            "/snapshot.jpg": self._snapshot,
+            "/stream.mjpg": self._stream,
+            "/events": self._events,
+        }
+        self._stream_clients = 0
+        self._event_clients = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sock: Optional[socket.socket] = None
+        self._frame_event: Optional[asyncio.Event] = None
+        # Multipart header of the newest frame, built once and shared by viewers
+        self._part_head: Tuple[int, bytes] = (0, b"")
+        self._tasks = set()
+
+    async def serve(self, host: str, port: int) -> None:
+        self._loop = asyncio.get_event_loop()
+        self._frame_event = asyncio.Event()
+        loop = self._loop
+        self.grabber.add_listener(self._notify_frame)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(128)
+        sock.setblocking(False)
+        self._sock = sock
+        while True:
+            conn, _addr = await loop.sock_accept(sock)
+            self._tune(conn)
+            task = loop.create_task(self._handle(conn))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def close(self) -> None:
+        """Cancel client tasks and close the listening socket (loop must be stopped)."""
+        if self._sock is not None:
+            self._sock.close()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks and self._loop is not None:
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    def _tune(self, conn: socket.socket) -> None:
+        conn.setblocking(False)
+        # Each MJPEG part leaves in one sendmsg; don't let Nagle hold it back,
+        # and give the kernel room for a whole frame so sends rarely block
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
+        except OSError:
+            pass
+
+    def _notify_frame(self) -> None:
+        # Grabber thread: skip the self-pipe write and loop wake-up when idle.
+        # Stream clients register before checking for a frame, so none is missed.
+        if self._stream_clients or self._event_clients:
+            self._loop.call_soon_threadsafe(self._on_frame)
+
+    def _on_frame(self) -> None:
+        # Broadcast: wake everyone waiting on the current event, then arm a new one
+        event, self._frame_event = self._frame_event, asyncio.Event()
+        event.set()
 
-        def log_message(self, fmt: str, *args) -> None:
-            # Reduce console noise; uncomment for verbose
-            # sys.stderr.write("%s - - [%s] %s\n" % (self.address_string(), self.log_date_time_string(), fmt % args))
+    async def _read_request(self, conn: socket.socket, buf: bytes):
+        """Return ((method, path, keep_alive), leftover) or (None, b"") on EOF/garbage."""
+        while b"\r\n\r\n" not in buf:
+            if len(buf) > self.max_request_bytes:
+                return None, b""
+            chunk = await self._loop.sock_recv(conn, 4096)
+            if not chunk:
+                return None, b""
+            buf += chunk
+        head, _, rest = buf.partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        if len(parts) != 3:
+            return None, b""
+        method, target, version = parts
+        connection = ""
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "connection":
+                connection = value.strip().lower()
+        if version == "HTTP/1.1":
+            keep_alive = connection != "close"
+        else:
+            keep_alive = connection == "keep-alive"
+        # Ignore query strings (e.g. cache-busting ?t=... on snapshot polls)
+        return (method, target.split("?", 1)[0], keep_alive), rest
+
+    async def _send_error(self, conn: socket.socket, code: int, message: str) -> None:
+        body = message.encode("utf-8")
+        head = _response_head(
+            code,
+            (
+                ("Content-Type", "text/plain; charset=utf-8"),
+                ("Content-Length", str(len(body))),
+                ("Connection", "close"),
+            ),
+        )
+        await _sock_send_buffers(self._loop, conn, (head, body))
+
+    async def _handle(self, conn: socket.socket) -> None:
+        buf = b""
+        try:
+            while True:
+                request, buf = await self._read_request(conn, buf)
+                if request is None:
+                    return
+                method, path, keep_alive = request
+                if method != "GET":
+                    await self._send_error(conn, 405, "Method Not Allowed")
+                    return
+                handler = self._routes.get(path)
+                if handler is None:
+                    if path.startswith("/frame/"):
+                        handler = functools.partial(self._frame, path=path)
+                    else:
+                        handler = self._not_found
+                if not await handler(conn) or not keep_alive:
+                    return
+        except (ConnectionError, OSError):
+            # Client disconnected
             return
+        finally:
+            conn.close()
+
+    async def _index(self, conn: socket.socket) -> bool:
+        await _sock_send_buffers(self._loop, conn, (_INDEX_HEAD, _INDEX_HTML))
+        return True
+
+    async def _not_found(self, conn: socket.socket) -> bool:
+        await self._send_error(conn, 404, "Not Found")
+        return False
+
+    async def _snapshot(self, conn: socket.socket) -> bool:
+        # The high-quality re-encode blocks, so keep it off the event loop
+        frame = await self._loop.run_in_executor(None, self.grabber.snapshot_jpeg)
+        if not frame:
+            await self._send_error(conn, 503, "No frame available yet")
+            return False
+        head = _response_head(
+            200,
+            (
+                ("Content-Type", "image/jpeg"),
+                ("Content-Length", str(len(frame))),
+                ("Cache-Control", "no-store"),
+            ),
+        )
+        await _sock_send_buffers(self._loop, conn, (head, frame))
+        return True
+
+    async def _frame(self, conn: socket.socket, path: str) -> bool:
+        match = _FRAME_PATH.fullmatch(path)
+        frame = self.grabber.frame(int(match.group(1))) if match else None
+        if frame is None:
+            # Unknown or already rotated out of the history ring
+            return await self._not_found(conn)
+        head = _response_head(
+            200,
+            (
+                ("Content-Type", "image/jpeg"),
+                ("Content-Length", str(len(frame))),
+                ("Cache-Control", "no-store"),
+            ),
+        )
+        await _sock_send_buffers(self._loop, conn, (head, frame))
+        return True
+
+    async def _events(self, conn: socket.socket) -> bool:
+        self._event_clients += 1
+        try:
+            await _sock_send_buffers(self._loop, conn, (_EVENTS_HEAD,))
+            last_seq = 0
+            while True:
+                event = self._frame_event
+                res = self.grabber.get(last_seq)
+                if res is None:
+                    await event.wait()
+                    continue
+                last_seq = res[0]
+                await _sock_send_buffers(self._loop, conn, (b"data: %d\n\n" % last_seq,))
+        finally:
+            self._event_clients -= 1
+
+    async def _stream(self, conn: socket.socket) -> bool:
+        if self._stream_clients >= self.max_stream_clients:
+            await self._send_error(conn, 503, "Too many stream clients")
+            return False
+        self._stream_clients += 1
+        try:
+            await _sock_send_buffers(self._loop, conn, (_STREAM_HEAD,))
+            tracker = _ZeroCopyTracker.enable(conn) if self.zerocopy else None
+            last_seq = 0
+            while True:
+                # Only send when the grabber has published a newer frame; slow
+                # clients simply skip the ones they missed
+                event = self._frame_event
+                res = self.grabber.get(last_seq)
+                if res is None:
+                    await event.wait()
+                    continue
+                last_seq, frame = res
+                head_seq, head = self._part_head
+                if head_seq != last_seq:
+                    head = _PART_HEADER % len(frame)
+                    self._part_head = (last_seq, head)
+                zerocopy = None
+                if tracker is not None:
+                    tracker.reap()
+                    if len(frame) >= self.zerocopy_min_bytes:
+                        zerocopy = tracker
+                # Header, payload and CRLF leave in one sendmsg; no JPEG copy
+                await _sock_send_buffers(
+                    self._loop, conn, (head, frame, b"\r\n"), zerocopy=zerocopy
+                )
+        finally:
+            self._stream_clients -= 1
 
-    return Handler
+
+def _parse_size(value: str) -> Optional[Tuple[int, int]]:
+    """argparse type for WxH sizes; empty means "not set"."""
+    if not value:
+        return None
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH, got {value!r}") from None
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive, got {value!r}")
+    if width % 2 or height % 2:
+        # I420 chroma planes are half size in both directions
+        raise argparse.ArgumentTypeError(f"width and height must be even, got {value!r}")
+    return width, height
 
 
 def parse_args(argv):
@@ -332,47 +1212,101 @@ def parse_args(argv):
         help="Argus sensor mode (optional)",
     )
     parser.add_argument("--port", type=int, default=int(os.getenv("STREAM_PORT", 8080)))
+    parser.add_argument(
+        "--stream-scale",
+        type=_parse_size,
+        # A string default goes through type=, so a bad env value is a usage error
+        default=os.getenv("STREAM_SCALE", ""),
+        metavar="WxH",
+        help="Scale frames on the GPU (nvvidconv) before encoding, e.g. 640x360",
+    )
     parser.add_argument("--quality", type=int, default=80, help="JPEG quality 1-100")
+    parser.add_argument(
+        "--encoder",
+        choices=("auto", "nvjpeg", "cpu"),
+        default=os.getenv("STREAM_ENCODER", "auto"),
+        help="JPEG encoder: nvjpeg (Jetson hardware), cpu (libjpeg-turbo), auto (nvjpeg if present)",
+    )
+    parser.add_argument(
+        "--max-fps",
+        type=float,
+        default=float(os.getenv("STREAM_MAX_FPS", 0)),
+        help="Cap published frames per second by skipping encodes (0 = source rate)",
+    )
+    parser.add_argument(
+        "--max-clients",
+        type=int,
+        default=_env_int("STREAM_MAX_CLIENTS", 8),
+        help="Maximum concurrent /stream.mjpg viewers",
+    )
+    parser.add_argument(
+        "--zerocopy",
+        action="store_true",
+        default=_env_truthy("STREAM_ZEROCOPY", "0"),
+        help="Send stream frames with MSG_ZEROCOPY (Linux >= 4.14; ignored elsewhere)",
+    )
+    parser.add_argument(
+        "--subsampling",
+        choices=("444", "422", "420"),
+        default=os.getenv("STREAM_SUBSAMPLING", "420"),
+        help="JPEG chroma subsampling for the CPU encoder (420 = smallest/fastest)",
+    )
+    parser.add_argument(
+        "--fastdct",
+        dest="fastdct",
+        action="store_true",
+        default=True,
+        help="Use libjpeg-turbo's fast integer DCT (default)",
+    )
+    parser.add_argument(
+        "--no-fastdct",
+        dest="fastdct",
+        action="store_false",
+        help="Use the slower, more accurate DCT",
+    )
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        default=_env_truthy("STREAM_PROGRESSIVE", "0"),
+        help="Encode progressive JPEGs (smaller, slower; CPU encoder via PyTurboJPEG or OpenCV)",
+    )
     return parser.parse_args(argv)
 
 
 def main(argv):
     args = parse_args(argv)
-    cap = build_capture(args)
-    # Use target_fps slightly lower than source to avoid backlog
-    grabber = FrameGrabber(cap, jpeg_quality=args.quality, target_fps=min(args.fps, 30))
+    cap, hw_encoded, yuv420 = build_capture(args)
+    grabber = FrameGrabber(
+        cap,
+        jpeg_quality=args.quality,
+        target_fps=args.max_fps,
+        hw_encoded=hw_encoded,
+        subsampling=args.subsampling,
+        fastdct=args.fastdct,
+        yuv420=yuv420,
+        progressive=args.progressive,
+    )
     grabber.start()
 
     addr = ("0.0.0.0", args.port)
-    handler = make_http_handler(grabber)
-    # Python <3.7 fallback for ThreadingHTTPServer
-    try:
-        HTTPServer = server.ThreadingHTTPServer  # type: ignore[attr-defined]
-    except AttributeError:
-        class ThreadingHTTPServer(socketserver.ThreadingMixIn, server.HTTPServer):
-            daemon_threads = True
-
-        HTTPServer = ThreadingHTTPServer
-    httpd = HTTPServer(addr, handler)
+    loop = asyncio.get_event_loop()
+    mjpeg = MJPEGServer(grabber, max_stream_clients=args.max_clients, zerocopy=args.zerocopy)
+    scaled = " scaled to {}x{},".format(*args.stream_scale) if args.stream_scale else ""
     print(
         f"[camera-stream] Serving MJPEG on http://{addr[0]}:{addr[1]} (index/, stream.mjpg, snapshot.jpg)"
-        f" {args.width}x{args.height}@{args.fps} via CSI (nvarguscamerasrc)",
+        f" {args.width}x{args.height}@{args.fps} via CSI (nvarguscamerasrc),{scaled}"
+        f" encoder={grabber.backend}",
     )
     try:
-        httpd.serve_forever()
+        loop.run_until_complete(mjpeg.serve(*addr))
     except KeyboardInterrupt:
         print("\n[camera-stream] Shutting down...")
     finally:
-        try:
-            httpd.shutdown()
-        except Exception:
-            pass
         grabber.stop()
+        mjpeg.close()
+        loop.close()
     return 0
 
 
 if __name__ == "__main__":
     raise SystemExit(main(sys.argv[1:]))
-def _env_truthy(name: str, default: str = "0") -> bool:
-    val = os.getenv(name, default)
-    return str(val).strip().lower() in {"1", "true", "yes", "on"}
@@ -16,6 +16,16 @@ import subprocess
 import sys
 import cv2
 
+try:
+    import gi
+
+    gi.require_version("Gst", "1.0")
+    from gi.repository import GLib, Gst
+
+    Gst.init(None)
+except (ImportError, ValueError):  # Optional: fall back to gst-inspect-1.0 + OpenCV
+    Gst = None
+
 
 def which(cmd):
     from shutil import which as _which
@@ -23,7 +33,36 @@ def which(cmd):
     return _which(cmd) is not None
 
 
+def _probe_csi_gst(width, height, fps):
+    """In-process probe: registry lookup plus a short-lived PLAYING pipeline."""
+    gst_present = Gst.ElementFactory.find("nvarguscamerasrc") is not None
+    can_open = False
+    if gst_present:
+        pipeline = None
+        try:
+            pipeline = Gst.parse_launch(
+                "nvarguscamerasrc ! "
+                f"video/x-raw(memory:NVMM), width={width}, height={height}, framerate={fps}/1 "
+                "! fakesink"
+            )
+            pipeline.set_state(Gst.State.PLAYING)
+            ret, _state, _pending = pipeline.get_state(5 * Gst.SECOND)
+            # Argus reports a missing sensor on the bus rather than as a state failure
+            error = pipeline.get_bus().timed_pop_filtered(
+                Gst.SECOND // 2, Gst.MessageType.ERROR
+            )
+            can_open = ret != Gst.StateChangeReturn.FAILURE and error is None
+        except GLib.Error:
+            can_open = False
+        finally:
+            if pipeline is not None:
+                pipeline.set_state(Gst.State.NULL)
+    return {"gst_present": gst_present, "can_open": can_open}
+
+
 def probe_csi(width=1280, height=720, fps=30):
+    if Gst is not None:
+        return _probe_csi_gst(width, height, fps)
     gst_present = which("gst-inspect-1.0")
     if gst_present:
         # Confirm Argus plugin exists
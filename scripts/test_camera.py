@@ -1,74 +1,207 @@
 #!/usr/bin/env python3
-"""Capture a single frame from the Jetson CSI camera (nvarguscamerasrc)."""
+"""Capture a single frame from the Jetson CSI camera (nvarguscamerasrc).
+
+Every option defaults to the matching environment variable (CSI_WIDTH,
+CSI_HEIGHT, CSI_FPS, CSI_SENSOR_ID, CSI_SENSOR_MODE, SNAPSHOT_PATH).
+"""
+import argparse
 import os
 import sys
 from pathlib import Path
+from typing import List
 import cv2
 
-WIDTH = int(os.getenv("CSI_WIDTH", "1280"))
-HEIGHT = int(os.getenv("CSI_HEIGHT", "720"))
-FPS = int(os.getenv("CSI_FPS", "30"))
-SENSOR_ID = int(os.getenv("CSI_SENSOR_ID", "0"))
-SENSOR_MODE = os.getenv("CSI_SENSOR_MODE")
-SNAPSHOT_PATH = Path(os.getenv("SNAPSHOT_PATH", "notebooks/camera_snapshot.jpg"))
-
-mode = f" sensor-mode={SENSOR_MODE}" if SENSOR_MODE else ""
-pipeline = (
-    f"nvarguscamerasrc sensor-id={SENSOR_ID}{mode} ! "
-    f"video/x-raw(memory:NVMM), width={WIDTH}, height={HEIGHT}, framerate={FPS}/1 "
-    "! nvvidconv ! video/x-raw, format=RGBA ! appsink drop=true max-buffers=1 sync=false"
-)
-
-
-def _describe_path(prefix: str, path: Path) -> None:
-    if path.exists():
-        try:
-            stat = path.stat()
-            print(
-                f"[camera-test][debug] {prefix}: exists owner={stat.st_uid}:{stat.st_gid} "
-                f"mode={oct(stat.st_mode & 0o777)}"
-            )
-        except OSError as exc:
-            print(f"[camera-test][debug] {prefix}: exists but stat failed ({exc})")
-    else:
-        print(f"[camera-test][debug] {prefix}: MISSING")
-
-
-def log_environment() -> None:
-    print(
-        "[camera-test][debug] Env CSI_WIDTH/HEIGHT/FPS/ID/MODE="
-        f"{WIDTH}/{HEIGHT}/{FPS}/{SENSOR_ID}/{SENSOR_MODE}"
+try:
+    import simplejpeg
+except ImportError:  # Optional: fall back to cv2.imwrite
+    simplejpeg = None
+
+try:
+    from jetson_utils import saveImage, videoSource
+except ImportError:
+    try:  # Older jetson-inference builds only ship the jetson.utils namespace
+        from jetson.utils import saveImage, videoSource
+    except ImportError:  # Optional: capture through GStreamer + OpenCV instead
+        videoSource = None
+
+
+def build_pipeline(width, height, fps, sensor_id=0, sensor_mode=None, fmt="BGRx"):
+    """GStreamer pipeline for one CSI frame; nvvidconv emits ``fmt`` (BGRx or I420)."""
+    mode = f" sensor-mode={sensor_mode}" if sensor_mode is not None else ""
+    return (
+        f"nvarguscamerasrc sensor-id={sensor_id}{mode} ! "
+        f"video/x-raw(memory:NVMM), width={width}, height={height}, framerate={fps}/1 "
+        f"! nvvidconv ! video/x-raw, format={fmt} ! appsink drop=true max-buffers=1 sync=false"
     )
-    print(f"[camera-test][debug] Pipeline: {pipeline}")
-    _describe_path("Argus socket /tmp/argus_socket", Path("/tmp/argus_socket"))
-    _describe_path(f"CSI device /dev/video{SENSOR_ID}", Path(f"/dev/video{SENSOR_ID}"))
-    video_nodes = sorted(Path("/dev").glob("video*"))
-    print(
+
+
+def _describe_path(prefix: str, path: Path) -> str:
+    # One stat() answers both "does it exist" and owner/mode
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return f"[camera-test][debug] {prefix}: MISSING"
+    except OSError as exc:
+        return f"[camera-test][debug] {prefix}: exists but stat failed ({exc})"
+    return (
+        f"[camera-test][debug] {prefix}: exists owner={stat.st_uid}:{stat.st_gid} "
+        f"mode={oct(stat.st_mode & 0o777)}"
+    )
+
+
+def _video_nodes() -> List[str]:
+    try:
+        return sorted(entry.name for entry in os.scandir("/dev") if entry.name.startswith("video"))
+    except OSError:
+        return []
+
+
+def log_environment(args, pipeline: str) -> None:
+    device = f"/dev/video{args.sensor_id}"
+    video_nodes = _video_nodes()
+    lines = [
+        "[camera-test][debug] CSI width/height/fps/id/mode="
+        f"{args.width}/{args.height}/{args.fps}/{args.sensor_id}/{args.sensor_mode}",
+        f"[camera-test][debug] Pipeline: {pipeline}",
+        _describe_path("Argus socket /tmp/argus_socket", Path("/tmp/argus_socket")),
+        _describe_path(f"CSI device {device}", Path(device)),
         "[camera-test][debug] Video nodes visible: "
-        + (", ".join(node.name for node in video_nodes) if video_nodes else "<none>")
+        + (", ".join(video_nodes) if video_nodes else "<none>"),
+    ]
+    print("\n".join(lines))
+
+
+def snapshot_via_jetson_utils(args) -> bool:
+    """Capture and save one frame with jetson-utils; return False if it cannot.
+
+    videoSource maps the Argus buffer into CUDA memory over EGLStream and
+    saveImage writes it from there, so nvvidconv and the appsink copy are skipped.
+    """
+    if videoSource is None or args.sensor_mode is not None:
+        # jetson-utils has no way to pick an Argus sensor mode
+        return False
+    argv = [
+        f"--input-width={args.width}",
+        f"--input-height={args.height}",
+        f"--input-rate={args.fps}",
+    ]
+    source = None
+    try:
+        source = videoSource(f"csi://{args.sensor_id}", argv=argv)
+        img = source.Capture()
+        if img is None:
+            return False
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        saveImage(str(args.output), img)
+    except Exception as exc:
+        print(f"[camera-test][warn] jetson-utils capture failed ({exc}); using GStreamer")
+        return False
+    finally:
+        if source is not None:
+            source.Close()
+    return True
+
+
+def _i420_planes(frame):
+    """Y, U and V views of an (H*3/2, W) I420 frame, without copying."""
+    height, width = frame.shape[0] * 2 // 3, frame.shape[1]
+    flat, luma = frame.reshape(-1), height * width
+    return (
+        flat[:luma].reshape(height, width),
+        flat[luma:luma + luma // 4].reshape(height // 2, width // 2),
+        flat[luma + luma // 4:luma + luma // 2].reshape(height // 2, width // 2),
+    )
+
+
+def save_frame(frame, path: Path, fmt: str) -> bool:
+    """Write one captured frame; returns False if the file could not be written."""
+    is_jpeg = path.suffix.lower() in (".jpg", ".jpeg")
+    if fmt == "I420":
+        # simplejpeg < 1.7 (the Python 3.6 image) lacks encode_jpeg_yuv_planes
+        if is_jpeg and hasattr(simplejpeg, "encode_jpeg_yuv_planes"):
+            # Encode the Y/U/V planes directly, without a BGR round-trip
+            jpeg = simplejpeg.encode_jpeg_yuv_planes(*_i420_planes(frame), quality=95)
+            return _write_bytes(path, jpeg)
+        frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+    if simplejpeg is not None and is_jpeg:
+        # simplejpeg reads BGRx directly via libjpeg-turbo's BGRX colorspace
+        is_bgrx = frame.ndim == 3 and frame.shape[2] == 4
+        jpeg = simplejpeg.encode_jpeg(frame, quality=95, colorspace="BGRX" if is_bgrx else "BGR")
+        return _write_bytes(path, jpeg)
+    if frame.ndim == 3 and frame.shape[2] == 4:
+        # imwrite would take the padding byte for alpha (PNG, TIFF) or reject it
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return cv2.imwrite(str(path), frame)
+
+
+def _write_bytes(path: Path, data: bytes) -> bool:
+    try:
+        path.write_bytes(data)
+    except OSError as exc:
+        print(f"[camera-test][warn] {exc}")
+        return False
+    return True
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Capture one CSI camera frame to a file")
+    parser.add_argument("--width", type=int, default=int(os.getenv("CSI_WIDTH", "1280")))
+    parser.add_argument("--height", type=int, default=int(os.getenv("CSI_HEIGHT", "720")))
+    parser.add_argument("--fps", type=int, default=int(os.getenv("CSI_FPS", "30")))
+    parser.add_argument("--sensor-id", type=int, default=int(os.getenv("CSI_SENSOR_ID", "0")))
+    parser.add_argument(
+        "--sensor-mode",
+        type=int,
+        default=(int(os.getenv("CSI_SENSOR_MODE")) if os.getenv("CSI_SENSOR_MODE") else None),
+        help="Argus sensor mode (optional)",
+    )
+    parser.add_argument(
+        "--format",
+        dest="fmt",
+        choices=("BGRx", "I420"),
+        default="BGRx",
+        help="Raw format requested from nvvidconv on the GStreamer path",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path(os.getenv("SNAPSHOT_PATH", "notebooks/camera_snapshot.jpg")),
+        help="Snapshot file (default: $SNAPSHOT_PATH)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    pipeline = build_pipeline(
+        args.width, args.height, args.fps, args.sensor_id, args.sensor_mode, args.fmt
     )
+    log_environment(args, pipeline)
+    if snapshot_via_jetson_utils(args):
+        print(f"[camera-test] Snapshot saved to {args.output} (jetson-utils)")
+        return 0
 
+    print(
+        f"[camera-test] Opening CSI pipeline: {args.width}x{args.height}@{args.fps} "
+        f"sensor-id={args.sensor_id} sensor-mode={args.sensor_mode}"
+    )
+    cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+    if not cap.isOpened():
+        sys.exit("[camera-test] Unable to open CSI camera via GStreamer (nvarguscamerasrc)")
 
-log_environment()
-print(
-    f"[camera-test] Opening CSI pipeline: {WIDTH}x{HEIGHT}@{FPS} sensor-id={SENSOR_ID} sensor-mode={SENSOR_MODE}"
-)
-cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
-if not cap.isOpened():
-    sys.exit("[camera-test] Unable to open CSI camera via GStreamer (nvarguscamerasrc)")
+    ok, frame = cap.read()
+    cap.release()
 
-ok, frame = cap.read()
-cap.release()
+    if not ok or frame is None:
+        sys.exit("[camera-test] Failed to read frame from camera")
 
-if not ok or frame is None:
-    sys.exit("[camera-test] Failed to read frame from camera")
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    if not save_frame(frame, args.output, args.fmt):
+        sys.exit(f"[camera-test] Unable to write snapshot to {args.output}")
 
-# Convert RGBA to BGR before saving
-if frame.ndim == 3 and frame.shape[2] == 4:
-    frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+    print(f"[camera-test] Snapshot saved to {args.output}")
+    return 0
 
-SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
-if not cv2.imwrite(str(SNAPSHOT_PATH), frame):
-    sys.exit(f"[camera-test] Unable to write snapshot to {SNAPSHOT_PATH}")
 
-print(f"[camera-test] Snapshot saved to {SNAPSHOT_PATH}")
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,255 @@
+"""Unit tests for scripts/camera_stream.py that run without a camera or GStreamer."""
+import argparse
+import asyncio
+import socket
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import camera_stream as cs  # noqa: E402
+
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture; FrameGrabber tests never start its threads."""
+
+    def read(self, image=None):
+        return False, None
+
+    def release(self):
+        pass
+
+
+class FakeTurboJPEG:
+    """Records encode calls so tests can see which PyTurboJPEG entry point ran."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, frame, **kwargs):
+        self.calls.append(("encode", frame.shape, kwargs))
+        return b"tj-bgr"
+
+    def encode_from_yuv(self, frame, height, width, **kwargs):
+        self.calls.append(("encode_from_yuv", (height, width), kwargs))
+        return b"tj-yuv"
+
+
+@pytest.fixture
+def encoders(monkeypatch):
+    """Choose which CPU encoders FrameGrabber sees: encoders(simplejpeg=..., turbojpeg=...)."""
+    tj = FakeTurboJPEG()
+    # Flag values only need to be distinct; the real wheel may be missing here
+    for name, value in (
+        ("TJFLAG_FASTDCT", 2048),
+        ("TJFLAG_PROGRESSIVE", 16384),
+        ("TJPF_BGR", 1),
+        ("TJPF_BGRX", 2),
+        ("TJSAMP_420", 2),
+        ("_TJ_SUBSAMPLING", {"444": 0, "422": 1, "420": 2}),
+    ):
+        monkeypatch.setattr(cs, name, value, raising=False)
+
+    def configure(simplejpeg=False, simplejpeg_yuv=False, turbojpeg=False):
+        fake_sj = None
+        if simplejpeg:
+            fake_sj = type("simplejpeg", (), {"encode_jpeg": staticmethod(lambda *a, **k: b"sj")})
+            if simplejpeg_yuv:
+                fake_sj.encode_jpeg_yuv_planes = staticmethod(lambda *a, **k: b"sj-yuv")
+        monkeypatch.setattr(cs, "simplejpeg", fake_sj)
+        monkeypatch.setattr(cs, "_SIMPLEJPEG_YUV", bool(simplejpeg and simplejpeg_yuv))
+        monkeypatch.setattr(cs, "_load_turbojpeg", lambda: tj if turbojpeg else None)
+        return tj
+
+    return configure
+
+
+def _i420_frame(width, height):
+    # Smooth gradients survive JPEG well enough to compare against the source
+    ys, xs = np.mgrid[0:height, 0:width]
+    bgr = np.dstack((xs * 255 // width, ys * 255 // height, 128 + 0 * xs)).astype(np.uint8)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+
+
+def test_parse_size_accepts_even_sizes_and_empty():
+    assert cs._parse_size("640x360") == (640, 360)
+    assert cs._parse_size("640X360") == (640, 360)
+    assert cs._parse_size("") is None
+
+
+@pytest.mark.parametrize("value", ["640", "640x", "axb", "640x360x2", "0x360", "-2x4", "641x360"])
+def test_parse_size_rejects_malformed_zero_and_odd_sizes(value):
+    with pytest.raises(argparse.ArgumentTypeError) as info:
+        cs._parse_size(value)
+    assert info.value.__cause__ is None
+
+
+def test_i420_planes_are_views_of_the_frame():
+    frame = _i420_frame(8, 4)
+    y, u, v = cs._i420_planes(frame)
+    assert (y.shape, u.shape, v.shape) == ((4, 8), (2, 4), (2, 4))
+    flat = frame.reshape(-1)
+    assert np.array_equal(y.reshape(-1), flat[:32])
+    assert np.array_equal(u.reshape(-1), flat[32:40])
+    assert np.array_equal(v.reshape(-1), flat[40:48])
+    assert np.shares_memory(y, frame) and np.shares_memory(v, frame)
+
+
+@pytest.mark.parametrize(
+    "available, yuv420, progressive, expected",
+    [
+        ({"simplejpeg": True, "simplejpeg_yuv": True, "turbojpeg": True}, False, False, "simplejpeg"),
+        ({"simplejpeg": True, "simplejpeg_yuv": True, "turbojpeg": True}, True, False, "simplejpeg (I420)"),
+        ({"simplejpeg": True, "simplejpeg_yuv": True, "turbojpeg": True}, False, True, "turbojpeg"),
+        ({"simplejpeg": True, "simplejpeg_yuv": True, "turbojpeg": True}, True, True, "turbojpeg (I420)"),
+        # simplejpeg 1.6 (Python 3.6 image) has no encode_jpeg_yuv_planes
+        ({"simplejpeg": True, "turbojpeg": True}, True, False, "turbojpeg (I420)"),
+        ({"simplejpeg": True}, False, False, "simplejpeg"),
+        ({"simplejpeg": True}, True, False, "opencv"),
+        ({"simplejpeg": True}, False, True, "opencv"),
+        ({"turbojpeg": True}, False, False, "turbojpeg"),
+        ({"turbojpeg": True}, True, False, "turbojpeg (I420)"),
+        ({}, False, False, "opencv"),
+        ({}, True, True, "opencv"),
+    ],
+)
+def test_frame_grabber_picks_backend(encoders, available, yuv420, progressive, expected):
+    encoders(**available)
+    grabber = cs.FrameGrabber(FakeCapture(), yuv420=yuv420, progressive=progressive)
+    assert grabber.backend == expected
+
+
+def test_frame_grabber_hw_encoded_skips_cpu_encoders(encoders):
+    encoders(simplejpeg=True, turbojpeg=True)
+    assert cs.FrameGrabber(FakeCapture(), hw_encoded=True).backend == "nvjpegenc"
+
+
+def test_turbojpeg_progressive_sets_flag(encoders):
+    tj = encoders(turbojpeg=True)
+    grabber = cs.FrameGrabber(FakeCapture(), progressive=True, fastdct=False)
+    grabber._encode(np.zeros((8, 8, 4), np.uint8))
+    name, _shape, kwargs = tj.calls[0]
+    assert name == "encode"
+    assert kwargs["flags"] == cs.TJFLAG_PROGRESSIVE
+    assert kwargs["pixel_format"] == cs.TJPF_BGRX
+
+
+def test_turbojpeg_i420_encodes_aligned_width_from_yuv(encoders):
+    tj = encoders(turbojpeg=True)
+    grabber = cs.FrameGrabber(FakeCapture(), yuv420=True)
+    assert grabber._encode(_i420_frame(24, 8)) == b"tj-yuv"
+    assert tj.calls[0][:2] == ("encode_from_yuv", (8, 24))
+
+
+def test_turbojpeg_i420_odd_chroma_width_falls_back_to_cv2(encoders):
+    # width 20: the 10-byte chroma rows are not 4-byte aligned, which
+    # encode_from_yuv (pad=4) would read as skewed planes
+    tj = encoders(turbojpeg=True)
+    grabber = cs.FrameGrabber(FakeCapture(), yuv420=True)
+    frame = _i420_frame(20, 8)
+    jpeg = grabber._encode(frame)
+    assert tj.calls == []
+    decoded = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (8, 20, 3)
+    expected = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+    assert np.abs(decoded.astype(int) - expected).mean() < 8
+
+
+def test_yuv_encoder_available_requires_aligned_width_for_turbojpeg(encoders):
+    encoders(turbojpeg=True)
+    assert cs.yuv_encoder_available(width=1280)
+    assert not cs.yuv_encoder_available(width=1276)
+    encoders(simplejpeg=True, simplejpeg_yuv=True)
+    assert cs.yuv_encoder_available(width=1276)
+    assert not cs.yuv_encoder_available(progressive=True, width=1280)
+
+
+def test_frame_path_matches_ascii_digits_only():
+    assert cs._FRAME_PATH.fullmatch("/frame/42.jpg").group(1) == "42"
+    for path in ("/frame/.jpg", "/frame/4a.jpg", "/frame/².jpg", "/frame/42.jpg/x", "/frame/-1.jpg"):
+        assert cs._FRAME_PATH.fullmatch(path) is None
+
+
+def test_response_head_formats_status_and_headers():
+    head = cs._response_head(404, (("Content-Length", "0"),))
+    assert head == b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+    assert cs._response_head(200) == b"HTTP/1.1 200 OK\r\n\r\n"
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    srv = cs.MJPEGServer(cs.FrameGrabber(FakeCapture()))
+    srv._loop = loop
+    yield srv
+    loop.close()
+
+
+def _exchange(srv, coro_factory, request):
+    """Send ``request`` from a client socket and run ``coro_factory(server_sock)``."""
+    client, conn = socket.socketpair()
+    conn.setblocking(False)
+    try:
+        client.sendall(request)
+        client.shutdown(socket.SHUT_WR)
+        result = srv._loop.run_until_complete(coro_factory(conn))
+        conn.close()
+        reply = b""
+        for chunk in iter(lambda: client.recv(65536), b""):
+            reply += chunk
+        return result, reply
+    finally:
+        client.close()
+        conn.close()
+
+
+def test_read_request_parses_request_line_and_keep_alive(server):
+    result, _ = _exchange(
+        server,
+        lambda conn: server._read_request(conn, b""),
+        b"GET /snapshot.jpg?t=1 HTTP/1.1\r\nHost: x\r\n\r\nGET / HTTP/1.1",
+    )
+    assert result == (("GET", "/snapshot.jpg", True), b"GET / HTTP/1.1")
+
+
+@pytest.mark.parametrize(
+    "request_bytes, keep_alive",
+    [
+        (b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n", False),
+        (b"GET / HTTP/1.0\r\n\r\n", False),
+        (b"GET / HTTP/1.0\r\nConnection: Keep-Alive\r\n\r\n", True),
+    ],
+)
+def test_read_request_keep_alive_follows_version_and_header(server, request_bytes, keep_alive):
+    (request, _rest), _ = _exchange(server, lambda conn: server._read_request(conn, b""), request_bytes)
+    assert request == ("GET", "/", keep_alive)
+
+
+@pytest.mark.parametrize("request_bytes", [b"GET /\r\n\r\n", b"GET / HTTP/1.1\r\n", b""])
+def test_read_request_rejects_garbage_and_eof(server, request_bytes):
+    result, _ = _exchange(server, lambda conn: server._read_request(conn, b""), request_bytes)
+    assert result == (None, b"")
+
+
+def test_read_request_rejects_oversized_head(server):
+    oversized = b"GET / HTTP/1.1\r\nX: " + b"a" * (server.max_request_bytes + 1)
+    result, _ = _exchange(server, lambda conn: server._read_request(conn, b""), oversized)
+    assert result == (None, b"")
+
+
+def test_route_table_covers_the_fixed_paths(server):
+    assert set(server._routes) == {"/", "/index.html", "/snapshot.jpg", "/stream.mjpg", "/events"}
+
+
+def test_frame_route_serves_recent_seq_and_404s_otherwise(server):
+    server.grabber._publish(b"\xff\xd8first")
+    server.grabber._publish(b"\xff\xd8second")
+    _, reply = _exchange(server, server._handle, b"GET /frame/1.jpg HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert reply.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert reply.endswith(b"\r\n\r\n\xff\xd8first")
+    for path in (b"/frame/99.jpg", b"/frame/\xc2\xb2.jpg", b"/nope"):
+        _, reply = _exchange(server, server._handle, b"GET " + path + b" HTTP/1.1\r\n\r\n")
+        assert reply.startswith(b"HTTP/1.1 404 Not Found\r\n")